@@ -53,6 +53,9 @@ from .string_helper import strip_whitespaces
 
 log = logger.create()
 
+_author_and_separator = re.compile(r'\s*&\s*')
+_search_term_separator = re.compile("[, ]+")
+
 cc_exceptions = ['composite', 'series']
 cc_classes = {}
 
@@ -125,10 +128,8 @@ class Identifiers(Base):
             return "Amazon"
         elif format_type.startswith("amazon_"):
             label_amazon = "Amazon.{0}"
-            country_code = format_type[7:].lower()
-            if country_code not in self.amazon:
-                return label_amazon.format(country_code)
-            return label_amazon.format(self.amazon[country_code])
+            country_code = format_type[7:]
+            return label_amazon.format(self.amazon.get(country_code, country_code))
         elif format_type == "isbn":
             return "ISBN"
         elif format_type == "doi":
@@ -170,10 +171,8 @@ class Identifiers(Base):
             return "https://amazon.com/dp/{0}".format(self.val)
         elif format_type.startswith('amazon_'):
             link_amazon = "https://amazon.{0}/dp/{1}"
-            country_code = format_type[7:].lower()
-            if country_code not in self.amazon:
-                return link_amazon.format(country_code, self.val)
-            return link_amazon.format(self.amazon[country_code], self.val)
+            country_code = format_type[7:]
+            return link_amazon.format(self.amazon.get(country_code, country_code), self.val)
         elif format_type == "isbn":
             return "https://www.worldcat.org/isbn/{0}".format(self.val)
         elif format_type == "doi":
@@ -948,7 +947,7 @@ class CalibreDB:
         self.create_functions()
         # self.session.connection().connection.connection.create_function("lower", 1, lcase)
         q = list()
-        author_terms = re.split(r'\s*&\s*', authr)
+        author_terms = _author_and_separator.split(authr)
         for author_term in author_terms:
             q.append(Books.authors.any(func.lower(Authors.name).ilike("%" + author_term + "%")))
 
@@ -960,7 +959,7 @@ class CalibreDB:
         self.create_functions()
         # self.session.connection().connection.connection.create_function("lower", 1, lcase)
         q = list()
-        author_terms = re.split("[, ]+", term)
+        author_terms = _search_term_separator.split(term)
         for author_term in author_terms:
             q.append(Books.authors.any(func.lower(Authors.name).ilike("%" + author_term + "%")))
         query = self.generate_linked_query(config.config_read_column, Books)
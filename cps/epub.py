@@ -17,25 +17,33 @@
 #  along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import posixpath
 import zipfile
+from functools import lru_cache
 from lxml import etree
 
 from . import isoLanguages, cover
 from . import config, logger
 from .helper import split_authors
-from .epub_helper import get_content_opf, default_ns
+from .epub_helper import get_content_opf_metadata, read_content_opf, default_ns, PURL_NAMESPACE
 from .constants import BookMeta
 from .string_helper import strip_whitespaces
 
 log = logger.create()
 
+_metadata_xpath = etree.XPath('/pkg:package/pkg:metadata', namespaces=default_ns)
+_layout_xpath = etree.XPath('pkg:meta[@property="rendition:layout"]/text()', namespaces=default_ns)
+_dc_xpaths = dict((s, etree.XPath('dc:%s/text()' % s, namespaces={'dc': PURL_NAMESPACE}))
+                  for s in ['title', 'description', 'creator', 'language', 'subject', 'publisher', 'date'])
+
 
 def _extract_cover(zip_file, cover_file, cover_path, tmp_file_name):
     if cover_file is None:
         return None
 
     cf = extension = None
-    zip_cover_path = os.path.join(cover_path, cover_file).replace('\\', '/')
+    # zip member names always use forward slashes
+    zip_cover_path = posixpath.join(cover_path, cover_file)
 
     prefix = os.path.splitext(tmp_file_name)[0]
     tmp_cover_name = prefix + '.' + os.path.basename(zip_cover_path)
@@ -47,23 +55,28 @@ def _extract_cover(zip_file, cover_file, cover_path, tmp_file_name):
     return cover.cover_processing(tmp_file_name, cf, extension)
 
 
+# mtime and size are part of the key, so a changed file is parsed again. OSErrors are passed to the caller, so
+# a file which can't be read at the moment isn't cached
+@lru_cache(maxsize=1024)
+def _load_epub_layout(file_path, mtime, size):
+    try:
+        p = get_content_opf_metadata(file_path, default_ns)
+        layout = _layout_xpath(p) if p is not None else []
+    except (etree.XMLSyntaxError, KeyError, IndexError, UnicodeDecodeError) as e:
+        log.error("Could not parse epub metadata of {} during kobo sync: {}".format(file_path, e))
+        layout = []
+    return layout[0] if len(layout) else None
+
+
 def get_epub_layout(book, book_data):
     file_path = os.path.normpath(os.path.join(config.get_book_path(),
                                               book.path, book_data.name + "." + book_data.format.lower()))
-
     try:
-        tree, __ = get_content_opf(file_path, default_ns)
-        p = tree.xpath('/pkg:package/pkg:metadata', namespaces=default_ns)[0]
-
-        layout = p.xpath('pkg:meta[@property="rendition:layout"]/text()', namespaces=default_ns)
-    except (etree.XMLSyntaxError, KeyError, IndexError, OSError, UnicodeDecodeError) as e:
+        file_stat = os.stat(file_path)
+        return _load_epub_layout(file_path, file_stat.st_mtime_ns, file_stat.st_size)
+    except OSError as e:
         log.error("Could not parse epub metadata of book {} during kobo sync: {}".format(book.id, e))
-        layout = []
-
-    if len(layout) == 0:
         return None
-    else:
-        return layout[0]
 
 
 def get_epub_info(tmp_file_path, original_file_name, original_file_extension, no_cover_processing):
@@ -73,16 +86,21 @@ def get_epub_info(tmp_file_path, original_file_name, original_file_extension, no
         'dc': 'http://purl.org/dc/elements/1.1/'
     }
 
-    tree, cf_name = get_content_opf(tmp_file_path, ns)
+    with zipfile.ZipFile(tmp_file_path) as epub_zip:
+        tree, cf_name = read_content_opf(epub_zip, ns)
 
-    cover_path = os.path.dirname(cf_name)
+        cover_path = posixpath.dirname(cf_name)
+        if not no_cover_processing:
+            cover_file = parse_epub_cover(ns, tree, epub_zip, cover_path, tmp_file_path)
+        else:
+            cover_file = None
 
-    p = tree.xpath('/pkg:package/pkg:metadata', namespaces=ns)[0]
+    p = _metadata_xpath(tree)[0]
 
     epub_metadata = {}
 
-    for s in ['title', 'description', 'creator', 'language', 'subject', 'publisher', 'date']:
-        tmp = p.xpath('dc:%s/text()' % s, namespaces=ns)
+    for s, dc_xpath in _dc_xpaths.items():
+        tmp = dc_xpath(p)
         if len(tmp) > 0:
             if s == 'creator':
                 epub_metadata[s] = ' & '.join(split_authors(tmp))
@@ -116,12 +134,6 @@ def get_epub_info(tmp_file_path, original_file_name, original_file_extension, no
 
     epub_metadata = parse_epub_series(ns, tree, epub_metadata)
 
-    epub_zip = zipfile.ZipFile(tmp_file_path)
-    if not no_cover_processing:
-        cover_file = parse_epub_cover(ns, tree, epub_zip, cover_path, tmp_file_path)
-    else:
-        cover_file = None
-
     identifiers = []
     for node in p.xpath('dc:identifier', namespaces=ns):
         try:
@@ -141,15 +153,15 @@ def get_epub_info(tmp_file_path, original_file_name, original_file_extension, no
     return BookMeta(
         file_path=tmp_file_path,
         extension=original_file_extension,
-        title=title.encode('utf-8').decode('utf-8'),
-        author=epub_metadata['creator'].encode('utf-8').decode('utf-8'),
+        title=title,
+        author=epub_metadata['creator'],
         cover=cover_file,
         description=epub_metadata['description'],
-        tags=epub_metadata['subject'].encode('utf-8').decode('utf-8'),
-        series=epub_metadata['series'].encode('utf-8').decode('utf-8'),
-        series_id=epub_metadata['series_id'].encode('utf-8').decode('utf-8'),
+        tags=epub_metadata['subject'],
+        series=epub_metadata['series'],
+        series_id=epub_metadata['series_id'],
         languages=epub_metadata['language'],
-        publisher=epub_metadata['publisher'].encode('utf-8').decode('utf-8'),
+        publisher=epub_metadata['publisher'],
         pubdate=epub_metadata['date'],
         identifiers=identifiers)
 
@@ -172,9 +184,11 @@ def parse_epub_cover(ns, tree, epub_zip, cover_path, tmp_file_path):
         cover_section = tree.xpath("/pkg:package/pkg:guide/pkg:reference/@href", namespaces=ns)
 
     cover_file = None
+    # image sources of html cover pages are relative to the first cover section
+    markup_dir = posixpath.dirname(posixpath.join(cover_path, cover_section[0])) if cover_section else None
     for cs in cover_section:
         if cs.endswith('.xhtml') or cs.endswith('.html'):
-            markup = epub_zip.read(os.path.join(cover_path, cs))
+            markup = epub_zip.read(posixpath.join(cover_path, cs))
             markup_tree = etree.fromstring(markup)
             # no matter xhtml or html with no namespace
             img_src = markup_tree.xpath("//*[local-name() = 'img']/@src")
@@ -182,9 +196,8 @@ def parse_epub_cover(ns, tree, epub_zip, cover_path, tmp_file_path):
             if not len(img_src):
                 img_src = markup_tree.xpath("//attribute::*[contains(local-name(), 'href')]")
             if len(img_src):
-                # img_src maybe start with "../"" so fullpath join then relpath to cwd
-                filename = os.path.relpath(os.path.join(os.path.dirname(os.path.join(cover_path, cover_section[0])),
-                                                        img_src[0]))
+                # img_src maybe start with "../"" so fullpath join then normalize within the archive
+                filename = posixpath.normpath(posixpath.join(markup_dir, img_src[0]))
                 cover_file = _extract_cover(epub_zip, filename, "", tmp_file_path)
         else:
             cover_file = _extract_cover(epub_zip, cs, cover_path, tmp_file_path)
@@ -16,6 +16,7 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import shutil
 import zipfile
 from lxml import etree
 
@@ -46,23 +47,42 @@ def updateEpub(src, dest, filename, data, ):
             zout.comment = zin.comment  # preserve the comment
             for item in zin.infolist():
                 if item.filename != filename:
-                    zout.writestr(item, zin.read(item.filename))
+                    with zin.open(item) as src_file, zout.open(item, 'w') as dest_file:
+                        shutil.copyfileobj(src_file, dest_file)
 
-    # now add filename with its new data
-    with zipfile.ZipFile(dest, mode='a', compression=zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr(filename, data)
+            # now add filename with its new data
+            zout.writestr(filename, data, compress_type=zipfile.ZIP_DEFLATED)
 
 
 def get_content_opf(file_path, ns=None):
+    with zipfile.ZipFile(file_path) as epubZip:
+        return read_content_opf(epubZip, ns)
+
+
+def _get_content_opf_name(epubZip, ns):
     if ns is None:
         ns = default_ns
-    epubZip = zipfile.ZipFile(file_path)
     txt = epubZip.read('META-INF/container.xml')
     tree = etree.fromstring(txt)
-    cf_name = tree.xpath('n:rootfiles/n:rootfile/@full-path', namespaces=ns)[0]
-    cf = epubZip.read(cf_name)
+    return tree.xpath('n:rootfiles/n:rootfile/@full-path', namespaces=ns)[0]
+
+
+def read_content_opf(epubZip, ns=None):
+    # Parses content.opf of an already opened epub archive
+    cf_name = _get_content_opf_name(epubZip, ns)
+    with epubZip.open(cf_name) as cf:
+        return etree.parse(cf).getroot(), cf_name
+
 
-    return etree.fromstring(cf), cf_name
+def get_content_opf_metadata(file_path, ns=None):
+    # Parses content.opf only up to the end of the metadata element, manifest and spine are never read
+    with zipfile.ZipFile(file_path) as epubZip:
+        cf_name = _get_content_opf_name(epubZip, ns)
+        with epubZip.open(cf_name) as cf:
+            for __, element in etree.iterparse(cf, events=('end',), tag=OPF + 'metadata',
+                                               resolve_entities=False, no_network=True):
+                return element
+    return None
 
 
 def create_new_metadata_backup(book,  custom_columns, export_language, translated_cover_name, lang_type=3):
@@ -164,6 +184,6 @@ def replace_metadata(tree, package):
     return etree.tostring(tree,
                           xml_declaration=True,
                           encoding='utf-8',
-                          pretty_print=True).decode('utf-8')
+                          pretty_print=True)
 
 
@@ -75,9 +75,10 @@ def validate_mime_type(file_buffer, allowed_extensions):
         try:
             with zipfile.ZipFile(BytesIO(file_buffer.read()), 'r') as epub:
                 file_buffer.seek(0)
-                if "mimetype" in epub.namelist():
-                    return True
-        except:
+                epub.getinfo("mimetype")
+                return True
+        # the upload is untrusted, any failure to open it as zip archive means it's not an allowed file
+        except Exception:
             file_buffer.seek(0)
     log.error("Mimetype '{}' not found in allowed types".format(tmp_mime_type))
     return False
@@ -17,12 +17,15 @@
 #  along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import codecs
 import json
 import shutil
+import threading
 import chardet
 import ssl
 import sqlite3
 import mimetypes
+from collections import OrderedDict
 
 from werkzeug.datastructures import Headers
 from flask import Response, stream_with_context
@@ -74,6 +77,12 @@ SETTINGS_YAML  = os.path.join(_CONFIG_DIR, 'settings.yaml')
 CREDENTIALS    = os.path.join(_CONFIG_DIR, 'gdrive_credentials')
 CLIENT_SECRETS = os.path.join(_CONFIG_DIR, 'client_secrets.json')
 
+# Quotes and backslashes inside of query string literals have to be escaped
+_QUERY_ESCAPE = str.maketrans({"'": r"\'", "\\": "\\\\"})
+
+# Folder lookups only need id and title
+FOLDER_FIELDS  = 'items(id,title),nextPageToken'
+
 log = logger.create()
 if gdrive_support:
     logger.get('googleapiclient.discovery_cache').setLevel(logger.logging.ERROR)
@@ -145,6 +154,20 @@ def is_gdrive_ready():
     return os.path.exists(SETTINGS_YAML) and os.path.exists(CREDENTIALS)
 
 
+# Drive ids of the recently served cover files, the entries are dropped whenever the stored folder ids change
+# (rename, move, delete of books)
+_COVER_FILE_CACHE_SIZE = 1024
+_cover_file_ids = OrderedDict()
+_cover_file_ids_lock = threading.Lock()
+
+DRIVE_DOWNLOAD_URL = 'https://www.googleapis.com/drive/v2/files/{}?alt=media'
+
+# One lock per folder path together with the number of requests using it, so concurrent lookups of the same
+# missing folder query drive only once, while lookups of unrelated folders don't wait for each other
+_folder_id_locks = dict()
+_folder_id_locks_guard = threading.Lock()
+
+
 engine = create_engine('sqlite:///{0}'.format(cli_param.gd_path), echo=False)
 Base = declarative_base()
 
@@ -211,11 +234,15 @@ def getDrive(drive=None, gauth=None):
     return drive
 
 
+def escape_query(value):
+    return value.translate(_QUERY_ESCAPE)
+
+
 def listRootFolders():
     try:
         drive = getDrive(Gdrive.Instance().drive)
         folder = "'root' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-        fileList = drive.ListFile({'q': folder}).GetList()
+        fileList = drive.ListFile({'q': folder, 'fields': FOLDER_FIELDS}).GetList()
     except (ServerNotFoundError, ssl.SSLError, RefreshError) as e:
         log.info("GDrive Error {}".format(e))
         fileList = []
@@ -230,10 +257,10 @@ def getFolderInFolder(parentId, folderName, drive):
     # drive = getDrive(drive)
     query = ""
     if folderName:
-        query = "title = '%s' and " % folderName.replace("'", r"\'")
+        query = "title = '%s' and " % escape_query(folderName)
     folder = query + "'%s' in parents and mimeType = 'application/vnd.google-apps.folder'" \
                      " and trashed = false" % parentId
-    fileList = drive.ListFile({'q': folder}).GetList()
+    fileList = drive.ListFile({'q': folder, 'fields': FOLDER_FIELDS}).GetList()
     if fileList.__len__() == 0:
         return None
     else:
@@ -262,52 +289,74 @@ def getEbooksFolderId(drive=None):
 
 
 def getFile(pathId, fileName, drive, nocase):
-    metaDataFile = "'%s' in parents and trashed = false and title contains '%s'" % (pathId, fileName.replace("'", r"\'"))
+    # an exact title match is filtered by drive, case-insensitive lookups have to fetch all similar titles
+    operator = "contains" if nocase else "="
+    metaDataFile = "'%s' in parents and trashed = false and title %s '%s'" % (pathId, operator,
+                                                                            escape_query(fileName))
     fileList = drive.ListFile({'q': metaDataFile}).GetList()
-    if fileList.__len__() == 0:
-        return None
     if nocase:
-        return fileList[0] if db.lcase(fileList[0]['title']) == db.lcase(fileName) else None
+        fileName = db.lcase(fileName)
+        for f in fileList:
+            if db.lcase(f['title']) == fileName:
+                return f
+        return None
     for f in fileList:
         if f['title'] == fileName:
             return f
     return None
 
 
+def _get_stored_folder_ids(folderPaths):
+    return dict(session.query(GdriveId.path, GdriveId.gdrive_id).filter(GdriveId.path.in_(folderPaths)).all())
+
+
 def getFolderId(path, drive):
     currentFolderId = None
     try:
         currentFolderId = getEbooksFolderId(drive)
         sqlCheckPath = path if path[-1] == '/' else path + '/'
-        storedPathName = session.query(GdriveId).filter(GdriveId.path == sqlCheckPath).first()
-
-        if not storedPathName:
-            dbChange = False
-            s = path.split('/')
-            for i, x in enumerate(s):
-                if len(x) > 0:
-                    currentPath = "/".join(s[:i+1])
-                    if currentPath[-1] != '/':
-                        currentPath = currentPath + '/'
-                    storedPathName = session.query(GdriveId).filter(GdriveId.path == currentPath).first()
-                    if storedPathName:
-                        currentFolderId = storedPathName.gdrive_id
-                    else:
-                        currentFolder = getFolderInFolder(currentFolderId, x, drive)
-                        if currentFolder:
-                            gDriveId = GdriveId()
-                            gDriveId.gdrive_id = currentFolder['id']
-                            gDriveId.path = currentPath
-                            session.merge(gDriveId)
-                            dbChange = True
-                            currentFolderId = currentFolder['id']
-                        else:
-                            currentFolderId = None
-                            break
-            if dbChange:
-                session.commit()
+        s = path.split('/')
+        # fetch the stored ids of the path and all its parent folders with one query
+        folderPaths = ["/".join(s[:i+1]) + '/' for i, x in enumerate(s) if len(x) > 0]
+        storedPaths = _get_stored_folder_ids(folderPaths)
+
+        if sqlCheckPath not in storedPaths:
+            # only one request at a time looks up a missing folder on drive, a waiting request finds the ids
+            # stored by the previous one and doesn't query drive for them again
+            with _folder_id_locks_guard:
+                path_lock = _folder_id_locks.setdefault(sqlCheckPath, [threading.Lock(), 0])
+                path_lock[1] += 1
+            try:
+                with path_lock[0]:
+                    storedPaths = _get_stored_folder_ids(folderPaths)
+                    dbChange = False
+                    for i, x in enumerate(s):
+                        if len(x) > 0:
+                            currentPath = "/".join(s[:i+1]) + '/'
+                            if currentPath in storedPaths:
+                                currentFolderId = storedPaths[currentPath]
+                            else:
+                                currentFolder = getFolderInFolder(currentFolderId, x, drive)
+                                if currentFolder:
+                                    gDriveId = GdriveId()
+                                    gDriveId.gdrive_id = currentFolder['id']
+                                    gDriveId.path = currentPath
+                                    session.merge(gDriveId)
+                                    dbChange = True
+                                    currentFolderId = currentFolder['id']
+                                else:
+                                    currentFolderId = None
+                                    break
+                    if dbChange:
+                        session.commit()
+            finally:
+                # drop the lock of the path again once nobody is using it
+                with _folder_id_locks_guard:
+                    path_lock[1] -= 1
+                    if path_lock[1] == 0 and _folder_id_locks.get(sqlCheckPath) is path_lock:
+                        del _folder_id_locks[sqlCheckPath]
         else:
-            currentFolderId = storedPathName.gdrive_id
+            currentFolderId = storedPaths[sqlCheckPath]
     except (OperationalError, IntegrityError, StaleDataError, sqlite3.IntegrityError) as ex:
         log.error_or_exception('Database error: {}'.format(ex))
         session.rollback()
@@ -390,7 +439,8 @@ def copyToDrive(drive, uploadFile, createRoot, replaceFiles,
         parent = getEbooksFolder(drive)
     if os.path.isdir(os.path.join(prevDir, uploadFile)):
         existingFolder = drive.ListFile({'q': "title = '%s' and '%s' in parents and trashed = false" %
-                                              (os.path.basename(uploadFile).replace("'", r"\'"), parent['id'])}).GetList()
+                                              (escape_query(os.path.basename(uploadFile)), parent['id']),
+                                         'fields': FOLDER_FIELDS}).GetList()
         if len(existingFolder) == 0 and (not isInitial or createRoot):
             parent = drive.CreateFile({'title': os.path.basename(uploadFile),
                                        'parents': [{"kind": "drive#fileLink", 'id': parent['id']}],
@@ -405,24 +455,48 @@ def copyToDrive(drive, uploadFile, createRoot, replaceFiles,
     else:
         if os.path.basename(uploadFile) not in ignoreFiles:
             existingFiles = drive.ListFile({'q': "title = '%s' and '%s' in parents and trashed = false" %
-                                                 (os.path.basename(uploadFile).replace("'", r"\'"), parent['id'])}).GetList()
+                                                 (escape_query(os.path.basename(uploadFile)), parent['id'])}).GetList()
             if len(existingFiles) > 0:
                 driveFile = existingFiles[0]
             else:
-                driveFile = drive.CreateFile({'title': os.path.basename(uploadFile).replace("'", r"\'"),
+                driveFile = drive.CreateFile({'title': os.path.basename(uploadFile),
                                               'parents': [{"kind": "drive#fileLink", 'id': parent['id']}], })
             driveFile.SetContentFile(os.path.join(prevDir, uploadFile))
             driveFile.Upload()
 
 
+def _stored_folder_exists(drive, folderId):
+    folder = drive.CreateFile({'id': folderId})
+    try:
+        folder.FetchMetadata(fields='labels')
+    except ApiRequestError as ex:
+        if ex.error.get('code') == 404:
+            return False
+        raise
+    return not folder.get('labels', {}).get('trashed', False)
+
+
 def uploadFileToEbooksFolder(destFile, f, string=False):
     drive = getDrive(Gdrive.Instance().drive)
-    parent = getEbooksFolder(drive)
     splitDir = destFile.split('/')
+    # if the id of the book folder is already stored in the gdrive database, only the file itself has to be looked
+    # up, otherwise walk down from the ebooks folder and create the missing folders. Drive is not queried for
+    # unknown folders here, new books are uploaded to folders which don't exist yet
+    folderPath = "/".join(splitDir[:-1]) + '/'
+    folderId = _get_stored_folder_ids([folderPath]).get(folderPath) if len(splitDir) > 1 else None
+    if folderId and not _stored_folder_exists(drive, folderId):
+        # the folder was deleted or trashed on drive, forget it and create it again
+        deleteDatabaseEntry(folderId)
+        folderId = None
+    if folderId:
+        parent = {'id': folderId}
+        splitDir = splitDir[-1:]
+    else:
+        parent = getEbooksFolder(drive)
     for i, x in enumerate(splitDir):
         if i == len(splitDir)-1:
             existing_Files = drive.ListFile({'q': "title = '%s' and '%s' in parents and trashed = false" %
-                                                  (x.replace("'", r"\'"), parent['id'])}).GetList()
+                                                  (escape_query(x), parent['id'])}).GetList()
             if len(existing_Files) > 0:
                 driveFile = existing_Files[0]
             else:
@@ -435,7 +509,8 @@ def uploadFileToEbooksFolder(destFile, f, string=False):
             driveFile.Upload()
         else:
             existing_Folder = drive.ListFile({'q': "title = '%s' and '%s' in parents and trashed = false" %
-                                                   (x.replace("'", r"\'"), parent['id'])}).GetList()
+                                                   (escape_query(x), parent['id']),
+                                              'fields': FOLDER_FIELDS}).GetList()
             if len(existing_Folder) == 0:
                 parent = drive.CreateFile({'title': x, 'parents': [{"kind": "drive#fileLink", 'id': parent['id']}],
                                            "mimeType": "application/vnd.google-apps.folder"})
@@ -535,6 +610,7 @@ def getChangeById(drive, change_id):
 
 # Deletes the local hashes database to force search for new folder names
 def deleteDatabaseOnChange():
+    _cover_file_ids.clear()
     try:
         session.query(GdriveId).delete()
         session.commit()
@@ -546,13 +622,15 @@ def deleteDatabaseOnChange():
 
 def updateGdriveCalibreFromLocal():
     copyToDrive(Gdrive.Instance().drive, config.config_calibre_dir, False, True)
-    for x in os.listdir(config.config_calibre_dir):
-        if os.path.isdir(os.path.join(config.config_calibre_dir, x)):
-            shutil.rmtree(os.path.join(config.config_calibre_dir, x))
+    with os.scandir(config.config_calibre_dir) as entries:
+        book_folders = [entry.path for entry in entries if entry.is_dir()]
+    for folder in book_folders:
+        shutil.rmtree(folder)
 
 
 # update gdrive.db on edit of books title
 def updateDatabaseOnEdit(ID, newPath):
+    _cover_file_ids.clear()
     sqlCheckPath = newPath if newPath[-1] == '/' else newPath + '/'
     storedPathName = session.query(GdriveId).filter(GdriveId.gdrive_id == ID).first()
     if storedPathName:
@@ -566,6 +644,7 @@ def updateDatabaseOnEdit(ID, newPath):
 
 # Deletes the hashes in database of deleted book
 def deleteDatabaseEntry(ID):
+    _cover_file_ids.clear()
     session.query(GdriveId).filter(GdriveId.gdrive_id == ID).delete()
     try:
         session.commit()
@@ -574,6 +653,7 @@ def deleteDatabaseEntry(ID):
         session.rollback()
 
 def deleteDatabasePath(Pathname):
+    _cover_file_ids.clear()
     session.query(GdriveId).filter(GdriveId.path.contains(Pathname)).delete()
     try:
         session.commit()
@@ -582,9 +662,14 @@ def deleteDatabasePath(Pathname):
         session.rollback()
 
 
-# Gets cover file from gdrive
+# Returns the drive id of the cover file and whether it was taken from the cache
 # ToDo: Check is this right everyone get read permissions on cover files?
-def get_cover_via_gdrive(cover_path):
+def _get_cover_file_id(cover_path):
+    with _cover_file_ids_lock:
+        file_id = _cover_file_ids.get(cover_path)
+        if file_id:
+            _cover_file_ids.move_to_end(cover_path)
+            return file_id, True
     df = getFileFromEbooksFolder(cover_path, 'cover.jpg')
     if df:
         if not session.query(PermissionAdded).filter(PermissionAdded.gdrive_id == df['id']).first():
@@ -602,12 +687,32 @@ def get_cover_via_gdrive(cover_path):
             except (OperationalError, IntegrityError) as ex:
                 log.error_or_exception('Database error: {}'.format(ex))
                 session.rollback()
-        headers = Headers()
-        headers["Content-Type"] = 'image/jpeg'
-        resp, content = df.auth.Get_Http_Object().request(df.metadata.get('downloadUrl'), headers=headers)
-        return content
-    else:
-        return None
+        with _cover_file_ids_lock:
+            _cover_file_ids[cover_path] = df['id']
+            if len(_cover_file_ids) > _COVER_FILE_CACHE_SIZE:
+                _cover_file_ids.popitem(last=False)
+        return df['id'], False
+    return None, False
+
+
+# Gets cover file from gdrive
+def get_cover_via_gdrive(cover_path):
+    drive = getDrive(Gdrive.Instance().drive)
+    headers = Headers()
+    headers["Content-Type"] = 'image/jpeg'
+    cached = True
+    # a cached id is looked up again if the cover file is no longer found under it
+    while cached:
+        file_id, cached = _get_cover_file_id(cover_path)
+        if not file_id:
+            return None
+        resp, content = drive.auth.Get_Http_Object().request(DRIVE_DOWNLOAD_URL.format(file_id), headers=headers)
+        if resp.status == 200:
+            return content
+        with _cover_file_ids_lock:
+            _cover_file_ids.pop(cover_path, None)
+    log.warning('An error occurred: {}'.format(resp))
+    return None
 
 
 # Gets cover file from gdrive
@@ -650,17 +755,27 @@ def do_gdrive_download(df, headers, convert_encoding=False):
     s = partial(total_size, 1024 * 1024)  # I'm downloading BIG files, so 100M chunk size is fine for me
 
     def stream(convert_encoding):
+        decoder = None
         for byte in s:
             headers = {"Range": 'bytes={}-{}'.format(byte[0], byte[1])}
             resp, content = df.auth.Get_Http_Object().request(download_url, headers=headers)
             if resp.status == 206:
                 if convert_encoding:
-                    result = chardet.detect(content)
-                    content = content.decode(result['encoding']).encode('utf-8')
+                    # pure ascii chunks are passed through unchanged, the encoding is detected on the first
+                    # chunk with other characters. The incremental decoder handles multibyte characters
+                    # split between two chunks
+                    if decoder is None:
+                        encoding = chardet.detect(content)['encoding']
+                        if encoding and encoding.lower() != 'ascii':
+                            decoder = codecs.getincrementaldecoder(encoding)()
+                    if decoder is not None:
+                        content = decoder.decode(content).encode('utf-8')
                 yield content
             else:
                 log.warning('An error occurred: {}'.format(resp))
                 return
+        if decoder is not None:
+            yield decoder.decode(b'', final=True).encode('utf-8')
     return Response(stream_with_context(stream(convert_encoding)), headers=headers)
 
 
@@ -69,6 +69,12 @@ from .embed_helper import do_calibre_export
 
 log = logger.create()
 
+_author_separator = re.compile('[&;]')
+_filename_invalid_chars = re.compile(r'[*+:\\\"/<>?]+', flags=re.U)
+_filename_pipes = re.compile(r'[|]+', flags=re.U)
+# name suffixes kept behind the first name when building the author sort, with or without trailing dot
+_author_suffixes = frozenset(['JR', 'SR', 'I', 'II', 'III', 'IV'])
+
 try:
     from wand.image import Image
     from wand.exceptions import MissingDelegateError, BlobError
@@ -249,9 +255,9 @@ def get_valid_filename(value, replace_whitespace=True, chars=128, force_unidecod
         value = (unidecode.unidecode(value))
     if replace_whitespace:
         #  *+:\"/<>? are replaced by _
-        value = re.sub(r'[*+:\\\"/<>?]+', '_', value, flags=re.U)
+        value = _filename_invalid_chars.sub('_', value)
         # pipe has to be replaced with comma
-        value = re.sub(r'[|]+', ',', value, flags=re.U)
+        value = _filename_pipes.sub(',', value)
 
     value = strip_whitespaces(value.encode('utf-8')[:chars].decode('utf-8', errors='ignore'))
 
@@ -263,7 +269,7 @@ def get_valid_filename(value, replace_whitespace=True, chars=128, force_unidecod
 def split_authors(values):
     authors_list = []
     for value in values:
-        authors = re.split('[&;]', value)
+        authors = _author_separator.split(value)
         for author in authors:
             commas = author.count(',')
             if commas == 1:
@@ -280,10 +286,11 @@ def get_sorted_author(value):
     value2 = None
     try:
         if ',' not in value:
-            regexes = [r"^(JR|SR)\.?$", r"^I{1,3}\.?$", r"^IV\.?$"]
-            combined = "(" + ")|(".join(regexes) + ")"
             value = value.split(" ")
-            if re.match(combined, value[-1].upper()):
+            suffix = value[-1].upper()
+            if suffix.endswith('.'):
+                suffix = suffix[:-1]
+            if suffix in _author_suffixes:
                 if len(value) > 1:
                     value2 = value[-2] + ", " + " ".join(value[:-2]) + " " + value[-1]
                 else:
@@ -296,7 +303,7 @@ def get_sorted_author(value):
             value2 = value
     except Exception as ex:
         log.error("Sorting author %s failed: %s", value, ex)
-        if isinstance(list, value2):
+        if isinstance(value, list):
             value2 = value[0]
         else:
             value2 = value
@@ -642,12 +649,8 @@ def generate_random_password(min_length):
 
 
 def uniq(inpt):
-    output = []
-    inpt = [" ".join(inp.split()) for inp in inpt]
-    for x in inpt:
-        if x not in output:
-            output.append(x)
-    return output
+    # dict keys keep the insertion order
+    return list(dict.fromkeys(" ".join(inp.split()) for inp in inpt))
 
 
 def check_email(email):
@@ -16,6 +16,7 @@
 #   You should have received a copy of the GNU General Public License
 #   along with this program. If not, see <http://www.gnu.org/licenses/>.
 import sys
+from functools import lru_cache
 
 from .iso_language_names import LANGUAGE_NAMES as _LANGUAGE_NAMES
 from . import logger
@@ -32,6 +33,7 @@ try:
         l.part3 = getattr(l, 'alpha_3', None)
         return l
 
+    @lru_cache(maxsize=1024)
     def get(name=None, part1=None, part3=None):
         if part3 is not None:
             return _copy_fields(pyc_languages.get(alpha_3=part3))
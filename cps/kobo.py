@@ -207,8 +207,8 @@ def HandleSyncRequest():
                            .order_by(db.Books.id))
 
     reading_states_in_new_entitlements = []
-    books = changed_entries.limit(SYNC_ITEM_LIMIT)
-    log.debug("Books to Sync: {}".format(len(books.all())))
+    books = changed_entries.limit(SYNC_ITEM_LIMIT).all()
+    log.debug("Books to Sync: {}".format(len(books)))
     for book in books:
         formats = [data.format for data in book.Books.data]
         if 'KEPUB' not in formats and config.config_kepubifypath and 'EPUB' in formats:
@@ -285,8 +285,12 @@ def HandleSyncRequest():
              ub.KoboReadingState.book_id.notin_(reading_states_in_new_entitlements)))\
         .order_by(ub.KoboReadingState.last_modified)
     cont_sync |= bool(changed_reading_states.count() > SYNC_ITEM_LIMIT)
-    for kobo_reading_state in changed_reading_states.limit(SYNC_ITEM_LIMIT).all():
-        book = calibre_db.session.query(db.Books).filter(db.Books.id == kobo_reading_state.book_id).one_or_none()
+    changed_reading_states = changed_reading_states.limit(SYNC_ITEM_LIMIT).all()
+    # fetch the books of all changed reading states with one query
+    changed_books = dict((book.id, book) for book in calibre_db.session.query(db.Books).filter(
+        db.Books.id.in_([state.book_id for state in changed_reading_states])))
+    for kobo_reading_state in changed_reading_states:
+        book = changed_books.get(kobo_reading_state.book_id)
         if book:
             sync_results.append({
                 "ChangedReadingState": {
@@ -352,12 +356,17 @@ def HandleMetadataRequest(book_uuid):
     return response
 
 
+# Returns the host of the request without port, bracketed ipv6 addresses without port are kept as they are
+def get_request_host():
+    host = request.host
+    if host.endswith(']'):
+        return host
+    return host.rpartition(':')[0] or host
+
+
 def get_download_url_for_book(book_id, book_format):
     if not current_app.wsgi_app.is_proxied:
-        if ':' in request.host and not request.host.endswith(']'):
-            host = "".join(request.host.split(':')[:-1])
-        else:
-            host = request.host
+        host = get_request_host()
 
         return "{url_scheme}://{url_base}:{url_port}/kobo/{auth_token}/download/{book_id}/{book_format}".format(
             url_scheme=request.scheme,
@@ -444,23 +453,26 @@ def get_metadata(book):
     for book_data in kepub if len(kepub) > 0 else book.data:
         if book_data.format not in KOBO_FORMATS:
             continue
+        # the layout is the same for all kobo formats of one file
+        try:
+            fixed_layout = get_epub_layout(book, book_data) == 'pre-paginated'
+        except (zipfile.BadZipfile, FileNotFoundError) as e:
+            log.error(e)
+            continue
         for kobo_format in KOBO_FORMATS[book_data.format]:
             # log.debug('Id: %s, Format: %s' % (book.id, kobo_format))
-            try:
-                if get_epub_layout(book, book_data) == 'pre-paginated':
-                    kobo_format = 'EPUB3FL'
-                download_urls.append(
-                    {
-                        "Format": kobo_format,
-                        "Size": book_data.uncompressed_size,
-                        "Url": get_download_url_for_book(book.id, book_data.format),
-                        # The Kobo forma accepts platforms: (Generic, Android)
-                        "Platform": "Generic",
-                        # "DrmType": "None", # Not required
-                    }
-                )
-            except (zipfile.BadZipfile, FileNotFoundError) as e:
-                log.error(e)
+            if fixed_layout:
+                kobo_format = 'EPUB3FL'
+            download_urls.append(
+                {
+                    "Format": kobo_format,
+                    "Size": book_data.uncompressed_size,
+                    "Url": get_download_url_for_book(book.id, book_data.format),
+                    # The Kobo forma accepts platforms: (Generic, Android)
+                    "Platform": "Generic",
+                    # "DrmType": "None", # Not required
+                }
+            )
 
     book_uuid = book.uuid
     metadata = {
@@ -489,18 +501,19 @@ def get_metadata(book):
     }
     metadata.update(get_author(book))
 
-    if get_series(book):
-        name = get_series(book)
+    name = get_series(book)
+    if name:
+        series_index = get_seriesindex(book)
         try:
             metadata["Series"] = {
-                "Name": get_series(book),
-                "Number": get_seriesindex(book),        # ToDo Check int() ?
-                "NumberFloat": float(get_seriesindex(book)),
+                "Name": name,
+                "Number": series_index,        # ToDo Check int() ?
+                "NumberFloat": float(series_index),
                 # Get a deterministic id based on the series name.
                 "Id": str(uuid.uuid3(uuid.NAMESPACE_DNS, name)),
             }
-        except Exception as e:
-            print(e)
+        except (TypeError, ValueError) as e:
+            log.error(e)
     return metadata
 
 
@@ -818,24 +831,27 @@ def HandleStateRequest(book_uuid):
         })
 
 
+READ_STATUS_TO_KOBO = {
+    None: "ReadyToRead",
+    ub.ReadBook.STATUS_UNREAD: "ReadyToRead",
+    ub.ReadBook.STATUS_FINISHED: "Finished",
+    ub.ReadBook.STATUS_IN_PROGRESS: "Reading",
+}
+
+KOBO_TO_READ_STATUS = {
+    None: None,
+    "ReadyToRead": ub.ReadBook.STATUS_UNREAD,
+    "Finished": ub.ReadBook.STATUS_FINISHED,
+    "Reading": ub.ReadBook.STATUS_IN_PROGRESS,
+}
+
+
 def get_read_status_for_kobo(ub_book_read):
-    enum_to_string_map = {
-        None: "ReadyToRead",
-        ub.ReadBook.STATUS_UNREAD: "ReadyToRead",
-        ub.ReadBook.STATUS_FINISHED: "Finished",
-        ub.ReadBook.STATUS_IN_PROGRESS: "Reading",
-    }
-    return enum_to_string_map[ub_book_read.read_status]
+    return READ_STATUS_TO_KOBO[ub_book_read.read_status]
 
 
 def get_ub_read_status(kobo_read_status):
-    string_to_enum_map = {
-        None: None,
-        "ReadyToRead": ub.ReadBook.STATUS_UNREAD,
-        "Finished": ub.ReadBook.STATUS_FINISHED,
-        "Reading": ub.ReadBook.STATUS_IN_PROGRESS,
-    }
-    return string_to_enum_map[kobo_read_status]
+    return KOBO_TO_READ_STATUS[kobo_read_status]
 
 
 def get_or_create_reading_state(book_id):
@@ -1073,10 +1089,7 @@ def HandleInitRequest():
 
     if not current_app.wsgi_app.is_proxied:
         log.debug('Kobo: Received unproxied request, changed request port to external server port')
-        if ':' in request.host and not request.host.endswith(']'):
-            host = "".join(request.host.split(':')[:-1])
-        else:
-            host = request.host
+        host = get_request_host()
         calibre_web_url = "{url_scheme}://{url_base}:{url_port}".format(
             url_scheme=request.scheme,
             url_base=host,
@@ -19,6 +19,7 @@
 import concurrent.futures
 import requests
 from bs4 import BeautifulSoup as BS  # requirement
+from bs4 import SoupStrainer
 from typing import List, Optional
 
 try:
@@ -33,6 +34,10 @@ import cps.logger as logger
 from operator import itemgetter
 log = logger.create()
 
+# only the parts of the pages that are evaluated are parsed
+SEARCH_RESULT_STRAINER = SoupStrainer("div", attrs={"data-component-type": "s-search-result"})
+PRODUCT_DETAIL_STRAINER = SoupStrainer("div", attrs={"cel_widget_id": "dpx-ppd_csm_instrumentation_wrapper"})
+
 
 class Amazon(Metadata):
     __name__ = "Amazon"
@@ -63,7 +68,7 @@ class Amazon(Metadata):
                 except Exception as ex:
                     log.warning(ex)
                     return []
-                long_soup = BS(r.text, "lxml")  #~4sec :/
+                long_soup = BS(r.text, "lxml", parse_only=PRODUCT_DETAIL_STRAINER)
                 soup2 = long_soup.find("div", attrs={"cel_widget_id": "dpx-ppd_csm_instrumentation_wrapper"})
                 if soup2 is None:
                     return []
@@ -130,7 +135,7 @@ class Amazon(Metadata):
             except Exception as e:
                 log.warning(e)
                 return []
-            soup = BS(results.text, 'html.parser')
+            soup = BS(results.text, 'lxml', parse_only=SEARCH_RESULT_STRAINER)
             links_list = [next(filter(lambda i: "digital-text" in i["href"], x.findAll("a")))["href"] for x in
                           soup.findAll("div", attrs={"data-component-type": "s-search-result"})]
             with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
@@ -40,6 +40,8 @@ SYMBOLS_TO_TRANSLATE = (
 SYMBOL_TRANSLATION_MAP = dict(
     [(ord(a), ord(b)) for (a, b) in zip(*SYMBOLS_TO_TRANSLATE)]
 )
+U_TAG_PATTERN = re.compile(r"<\s*(?P<solidus>/?)\s*[uU]\b(?P<rest>[^>]*)>")
+QUERY_CHARACTERS_PATTERN = re.compile(r"[\?()\/]")
 
 
 def get_int_or_float(value: str) -> Union[int, float]:
@@ -63,11 +65,7 @@ def html2text(html: str) -> str:
     # replace <u> tags with <span> as <u> becomes emphasis in html2text
     if isinstance(html, bytes):
         html = html.decode("utf-8")
-    html = re.sub(
-        r"<\s*(?P<solidus>/?)\s*[uU]\b(?P<rest>[^>]*)>",
-        r"<\g<solidus>span\g<rest>>",
-        html,
-    )
+    html = U_TAG_PATTERN.sub(r"<\g<solidus>span\g<rest>>", html)
     h2t = HTML2Text()
     h2t.body_width = 0
     h2t.single_line_break = True
@@ -137,9 +135,7 @@ class LubimyCzytac(Metadata):
 
     def _prepare_query(self, title: str) -> str:
         query = ""
-        characters_to_remove = r"\?()\/"
-        pattern = "[" + characters_to_remove + "]"
-        title = re.sub(pattern, "", title)
+        title = QUERY_CHARACTERS_PATTERN.sub("", title)
         title = title.replace("_", " ")
         if '"' in title or ",," in title:
             title = title.split('"')[0].split(",,")[0]
@@ -20,6 +20,7 @@ import threading
 import abc
 import uuid
 import time
+from operator import attrgetter
 
 try:
     import queue
@@ -101,7 +102,7 @@ class WorkerThread(threading.Thread):
     def tasks(self):
         with self.doLock:
             tasks = self.queue.to_list() + self.dequeued
-            return sorted(tasks, key=lambda x: x.num)
+            return sorted(tasks, key=attrgetter('num'))
 
     def cleanup_tasks(self):
         with self.doLock:
@@ -116,9 +117,9 @@ class WorkerThread(threading.Thread):
                 ret = alive
             else:
                 # otherwise, loop off the oldest dead tasks until we hit the target trigger
-                ret = sorted(dead, key=lambda y: y.task.end_time)[-TASK_CLEANUP_TRIGGER:] + alive
+                ret = sorted(dead, key=attrgetter('task.end_time'))[-TASK_CLEANUP_TRIGGER:] + alive
 
-            self.dequeued = sorted(ret, key=lambda y: y.num)
+            self.dequeued = sorted(ret, key=attrgetter('num'))
 
     # Main thread loop starting the different tasks
     def run(self):
@@ -17,7 +17,9 @@
 #  along with this program. If not, see <http://www.gnu.org/licenses/>.
 import re
 
+_whitespace_border = re.compile(r"(^[\s\u200B-\u200D\ufeff]+)|([\s\u200B-\u200D\ufeff]+$)")
+
 
 def strip_whitespaces(text):
-    return re.sub(r"(^[\s\u200B-\u200D\ufeff]+)|([\s\u200B-\u200D\ufeff]+$)","", text)
+    return _whitespace_border.sub("", text)
 
@@ -43,6 +43,11 @@ from cps.string_helper import strip_whitespaces
 
 log = logger.create()
 
+# progress output of ebook-convert and the extra calibre parameters from the settings
+_progress_pattern = re.compile(r"(\d+)%\s.*")
+_calibre_parameter_pattern = re.compile(r"(--[\w-]+)(?:(\s(?:(\".+\")|(?:.+?)))(?:\s|$))?",
+                                        re.IGNORECASE | re.UNICODE)
+
 current_milli_time = lambda: int(round(time() * 1000))
 
 
@@ -303,8 +308,7 @@ class TaskConvert(CalibreTask):
                     command.extend(['--cover', os.path.join(os.path.dirname(file_path), 'cover.jpg')])
                     quotes_index = 7
             if config.config_calibre:
-                parameters = re.findall(r"(--[\w-]+)(?:(\s(?:(\".+\")|(?:.+?)))(?:\s|$))?",
-                                        config.config_calibre, re.IGNORECASE | re.UNICODE)
+                parameters = _calibre_parameter_pattern.findall(config.config_calibre)
                 if parameters:
                     for param in parameters:
                         command.append(strip_whitespaces(param[0]))
@@ -325,7 +329,7 @@ class TaskConvert(CalibreTask):
             if nextline:
                 log.debug(nextline)
             # parse progress string from calibre-converter
-            progress = re.search(r"(\d+)%\s.*", nextline)
+            progress = _progress_pattern.search(nextline) if '%' in nextline else None
             if progress:
                 self.progress = int(progress.group(1)) / 100
                 if config.config_use_google_drive:
@@ -211,9 +211,10 @@ class UserBase:
         return [strip_whitespaces(t) for t in mct.split(",")]
 
     def get_view_property(self, page, prop):
-        if not self.view_settings.get(page):
+        page_settings = self.view_settings.get(page)
+        if not page_settings:
             return None
-        return self.view_settings[page].get(prop)
+        return page_settings.get(prop)
 
     def set_view_property(self, page, prop, value):
         if not self.view_settings.get(page):
@@ -327,11 +328,10 @@ class Anonymous(AnonymousUserMixin, UserBase):
         return False
 
     def get_view_property(self, page, prop):
-        if 'view' in flask_session:
-            if not flask_session['view'].get(page):
-                return None
-            return flask_session['view'][page].get(prop)
-        return None
+        page_settings = flask_session.get('view', {}).get(page)
+        if not page_settings:
+            return None
+        return page_settings.get(prop)
 
     def set_view_property(self, page, prop, value):
         if not 'view' in flask_session:
@@ -288,9 +288,10 @@ def get_series_json():
 def get_languages_json():
     query = (request.args.get('q') or '').lower()
     language_names = isoLanguages.get_language_names(get_locale())
-    entries_start = [s for key, s in language_names.items() if s.lower().startswith(query.lower())]
+    lower_names = [(s, s.lower()) for s in language_names.values()]
+    entries_start = [s for s, lower_s in lower_names if lower_s.startswith(query)]
     if len(entries_start) < 5:
-        entries = [s for key, s in language_names.items() if query in s.lower()]
+        entries = [s for s, lower_s in lower_names if query in lower_s]
         entries_start.extend(entries[0:(5 - len(entries_start))])
         entries_start = list(set(entries_start))
     json_dumps = json.dumps([dict(name=r) for r in entries_start[0:5]])
@@ -1651,14 +1652,13 @@ def show_book(book_id):
         entry.reader_list = check_read_formats(entry)
 
         entry.reader_list_sizes = dict()
-        for data in entry.data:
-            if data.format.lower() in entry.reader_list:
-                entry.reader_list_sizes[data.format.lower()] = data.uncompressed_size
-
         entry.audio_entries = []
-        for media_format in entry.data:
-            if media_format.format.lower() in constants.EXTENSIONS_AUDIO:
-                entry.audio_entries.append(media_format.format.lower())
+        for data in entry.data:
+            data_format = data.format.lower()
+            if data_format in entry.reader_list:
+                entry.reader_list_sizes[data_format] = data.uncompressed_size
+            if data_format in constants.EXTENSIONS_AUDIO:
+                entry.audio_entries.append(data_format)
 
         return render_title_template('detail.html',
                                      entry=entry,